@@ -2,11 +2,33 @@
 2ちゃんねるオッズ作成システム - Flask Webアプリケーション
 """
 import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+import orjson
 from flask import Flask, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from scraper import scrape_thread
 from odds_calculator import analyze_thread
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify のシリアライズを orjson（C実装）で行うJSONプロバイダ"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# URL行の区切り（スペースまたはタブ）
+_URL_SPLIT_RE = re.compile(r'\s+')
+
+# 同時にスクレイピングするスレッド数の上限
+MAX_SCRAPE_WORKERS = 8
 
 
 def parse_url_line(line: str) -> dict:
@@ -28,7 +50,7 @@ def parse_url_line(line: str) -> dict:
         return None
 
     # URLとレス番号範囲を分離（スペースまたはタブで区切る）
-    parts = re.split(r'\s+', line)
+    parts = _URL_SPLIT_RE.split(line)
 
     url = parts[0]
     start_num = 1
@@ -107,41 +129,50 @@ def analyze():
         if not (0.1 <= payout_rate <= 1.0):
             return jsonify({'error': '払い戻し率は10%〜100%の範囲で指定してください'}), 400
 
-        # 複数スレッドをスクレイピング
-        all_posts = []
+        # 複数スレッドを並列にスクレイピング（結果は入力順に処理）
+        post_chunks = []
         thread_results = []
 
-        for entry in url_entries:
-            url = entry['url']
-            start_num = entry['start']
-            end_num = entry['end']
-
-            try:
-                thread_data = scrape_thread(url)
-                posts = thread_data['posts']
-                total_posts = len(posts)
-
-                # レス番号範囲でフィルタリング（1-indexed）
-                slice_start = start_num - 1
-                slice_end = end_num if end_num else total_posts
-
-                filtered_posts = posts[slice_start:slice_end]
-
-                all_posts.extend(filtered_posts)
-                thread_results.append({
-                    'url': url,
-                    'post_count': len(filtered_posts),
-                    'total_posts': total_posts,
-                    'range': f"{start_num}-{end_num if end_num else total_posts}",
-                    'status': 'success'
-                })
-            except Exception as e:
-                thread_results.append({
-                    'url': url,
-                    'post_count': 0,
-                    'status': 'error',
-                    'error': str(e)
-                })
+        max_workers = min(MAX_SCRAPE_WORKERS, len(url_entries))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    scrape_thread,
+                    entry['url'],
+                    start=entry['start'],
+                    end=entry['end']
+                )
+                for entry in url_entries
+            ]
+
+            for entry, future in zip(url_entries, futures):
+                url = entry['url']
+                start_num = entry['start']
+                end_num = entry['end']
+
+                try:
+                    # レス番号範囲でのフィルタリングは scrape_thread 側で実施済み
+                    thread_data = future.result()
+                    total_posts = thread_data['total_posts']
+
+                    post_chunks.append(thread_data['posts'])
+                    thread_results.append({
+                        'url': url,
+                        'post_count': thread_data['post_count'],
+                        'total_posts': total_posts,
+                        'range': f"{start_num}-{end_num if end_num else total_posts}",
+                        'status': 'success'
+                    })
+                except Exception as e:
+                    thread_results.append({
+                        'url': url,
+                        'post_count': 0,
+                        'status': 'error',
+                        'error': str(e)
+                    })
+
+        # スレッドごとのレスを1回でまとめて連結
+        all_posts = list(chain.from_iterable(post_chunks))
 
         if not all_posts:
             return jsonify({'error': '有効なスレッドからレスを取得できませんでした'}), 400
@@ -3,8 +3,12 @@
 競馬式オッズ（出現数が多いほど低オッズ）を計算
 同義語グループ対応
 """
-import re
 from typing import List, Dict, Union
+import ahocorasick
+
+
+# 同義語の総数がこの値以上なら Aho-Corasick で照合する
+AHOCORASICK_MIN_SYNONYMS = 20
 
 
 def parse_keyword_groups(keywords_raw: List[str]) -> List[dict]:
@@ -52,23 +56,75 @@ def count_keyword_groups(posts: List[str], keyword_groups: List[dict]) -> Dict[s
     """
     counts = {g['display']: 0 for g in keyword_groups}
 
-    for group in keyword_groups:
-        # 同義語を長さの降順でソート（長いものを先にマッチさせる）
-        synonyms_sorted = sorted(group['synonyms'], key=len, reverse=True)
-
-        # 正規表現パターンを作成（長い語を先に配置してOR結合）
-        pattern_parts = [re.escape(s.lower()) for s in synonyms_sorted]
-        pattern = '(' + '|'.join(pattern_parts) + ')'
-
-        # 各レスで同義語のどれかが出現しているかチェック
+    synonym_total = sum(len(g['synonyms']) for g in keyword_groups)
+    if synonym_total >= AHOCORASICK_MIN_SYNONYMS:
+        # 同義語が多い場合は Aho-Corasick で全グループを1パスで照合
+        # 空の同義語を含むグループは全レスに一致する（部分文字列検索と同じ扱い）
+        for group in keyword_groups:
+            if '' in group['synonyms']:
+                counts[group['display']] += len(posts)
+        automaton = _build_automaton(keyword_groups)
+        if len(automaton) == 0:
+            return counts
         for post in posts:
-            post_lower = post.lower()
-            if re.search(pattern, post_lower):
-                counts[group['display']] += 1
+            seen = set()
+            for _, indices in automaton.iter(post.lower()):
+                seen.update(indices)
+            for idx in seen:
+                counts[keyword_groups[idx]['display']] += 1
+        return counts
+
+    # 同義語を長さの降順でソートして小文字化（長いものを先に判定）
+    group_synonyms = [
+        tuple(s.lower() for s in sorted(g['synonyms'], key=len, reverse=True))
+        for g in keyword_groups
+    ]
+    group_counts = _scan(posts, group_synonyms)
+
+    for group, count in zip(keyword_groups, group_counts):
+        counts[group['display']] += count
 
     return counts
 
 
+def _scan(posts: List[str], group_synonyms: List[tuple]) -> List[int]:
+    """
+    各グループについて、同義語のどれかを含むレスの数を数える
+
+    レスごとに全グループを判定する（レス本文の走査・小文字化は1回だけ）。
+    ループ内はローカル変数のみで辞書の更新を行わない
+    """
+    group_counts = [0] * len(group_synonyms)
+    for post in posts:
+        post_lower = post.lower()
+        for idx, synonyms_lower in enumerate(group_synonyms):
+            for syn in synonyms_lower:
+                if syn in post_lower:
+                    group_counts[idx] += 1
+                    break
+    return group_counts
+
+
+def _build_automaton(keyword_groups: List[dict]):
+    """
+    全グループの同義語を登録した Aho-Corasick オートマトンを構築
+
+    同じ語が複数グループに含まれる場合に備え、値はグループ番号のタプルにする。
+    空の同義語を含むグループは全レスに一致するため登録しない
+    """
+    automaton = ahocorasick.Automaton()
+    for idx, group in enumerate(keyword_groups):
+        if '' in group['synonyms']:
+            continue
+        for synonym in group['synonyms']:
+            word = synonym.lower()
+            indices = automaton.get(word, ())
+            if idx not in indices:
+                automaton.add_word(word, indices + (idx,))
+    automaton.make_automaton()
+    return automaton
+
+
 def count_keywords(posts: List[str], keywords: List[str]) -> Dict[str, int]:
     """
     レス本文リストから各キーワードの出現回数をカウント（後方互換性用）
@@ -100,6 +156,9 @@ def calculate_odds(counts: Dict[str, int], payout_rate: float = 0.80) -> Dict[st
     """
     total_count = sum(counts.values())
 
+    # ループ内で不変な分子（合計 × 払い戻し率）は先に計算しておく
+    payout_total = total_count * payout_rate
+
     results = {}
 
     for keyword, count in counts.items():
@@ -114,13 +173,13 @@ def calculate_odds(counts: Dict[str, int], payout_rate: float = 0.80) -> Dict[st
             }
         else:
             # オッズ計算: (合計 × 払い戻し率) / 出現数
-            odds = (total_count * payout_rate) / count
+            odds = payout_total / count
 
             # 最小オッズは1.0
             odds = max(odds, 1.0)
 
-            # 確率（出現数 / 合計）
-            probability = count / total_count if total_count > 0 else 0
+            # 確率（出現数 / 合計）。count > 0 なので合計も必ず正
+            probability = count / total_count
 
             results[keyword] = {
                 'count': count,
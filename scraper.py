@@ -1,11 +1,15 @@
 """
 5ちゃんねる スクレイピングモジュール
 """
+import html
 import re
 import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from selectolax.lexbor import LexborHTMLParser
 
 
 # User-Agent（Monazilla形式）
@@ -14,6 +18,31 @@ USER_AGENT = "Monazilla/1.00 (2chOdds/1.0)"
 # リクエスト間隔（秒）
 REQUEST_INTERVAL = 1.0
 
+# スレッドURLのパス解析用パターン
+_ITEST_PATH_RE = re.compile(r'/([^/]+)/test/read\.cgi/([^/]+)/(\d+)')
+_READCGI_PATH_RE = re.compile(r'/test/read\.cgi/([^/]+)/(\d+)')
+
+# dat取得時の受信チャンクサイズ（バイト）
+DAT_CHUNK_SIZE = 65536
+
+# dat本文のHTMLタグ除去用パターン
+_BR_RE = re.compile(r'<br\s*/?>', re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# HTMLフォールバック用のクラス名パターン
+_POST_CLASS_RE = re.compile(r'post|res|comment')
+_BODY_CLASS_RE = re.compile(r'message|body|content')
+
+# 接続を使い回すための共有セッション（並列取得時もコネクションプールを共有）
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+SESSION.headers.update({
+    'User-Agent': USER_AGENT,
+    'Accept-Encoding': 'gzip',
+})
+
 
 def parse_thread_url(url: str) -> dict:
     """
@@ -32,7 +61,7 @@ def parse_thread_url(url: str) -> dict:
     # https://itest.5ch.net/lavender/test/read.cgi/keiba/xxx/
     # → host=lavender.5ch.net, path=/test/read.cgi/keiba/xxx/
     if host == 'itest.5ch.net':
-        itest_match = re.match(r'/([^/]+)/test/read\.cgi/([^/]+)/(\d+)', parsed.path)
+        itest_match = _ITEST_PATH_RE.match(parsed.path)
         if itest_match:
             real_host = f"{itest_match.group(1)}.5ch.net"
             return {
@@ -43,7 +72,7 @@ def parse_thread_url(url: str) -> dict:
             }
 
     # read.cgi形式のパスを解析
-    match = re.match(r'/test/read\.cgi/([^/]+)/(\d+)', parsed.path)
+    match = _READCGI_PATH_RE.match(parsed.path)
     if match:
         return {
             'host': host,
@@ -55,27 +84,28 @@ def parse_thread_url(url: str) -> dict:
     raise ValueError(f"無効なスレッドURL形式: {url}")
 
 
-def fetch_thread_dat(host: str, board: str, thread_id: str, base_url: str) -> str:
+def fetch_thread_dat(host: str, board: str, thread_id: str,
+                     base_url: str) -> Tuple[int, Optional[bytearray]]:
     """
     dat形式でスレッドを取得（高速・効率的）
+
+    デコードは本文だけを parse_dat_content で行うため、生のバイト列を返す
+
+    Returns:
+        (HTTPステータスコード, datのバイト列（200以外はNone）)
     """
     dat_url = f"{base_url}/{board}/dat/{thread_id}.dat"
 
-    headers = {
-        'User-Agent': USER_AGENT,
-        'Accept-Encoding': 'gzip',
-    }
-
-    response = requests.get(dat_url, headers=headers, timeout=30)
+    with SESSION.get(dat_url, timeout=30, stream=True) as response:
+        if response.status_code != 200:
+            return response.status_code, None
 
-    if response.status_code == 200:
-        # Shift-JISでデコード
-        try:
-            return response.content.decode('cp932')
-        except UnicodeDecodeError:
-            return response.content.decode('shift_jis', errors='replace')
+        # 受信チャンクを直接追記し、response.content のチャンクリスト＋結合コピーを避ける
+        content = bytearray()
+        for chunk in response.iter_content(chunk_size=DAT_CHUNK_SIZE):
+            content += chunk
 
-    return None
+    return response.status_code, content
 
 
 def fetch_thread_html(url: str) -> str:
@@ -83,12 +113,11 @@ def fetch_thread_html(url: str) -> str:
     HTML形式でスレッドを取得（フォールバック用）
     """
     headers = {
-        'User-Agent': USER_AGENT,
         'Accept': 'text/html,application/xhtml+xml',
         'Accept-Language': 'ja,en-US;q=0.9,en;q=0.8',
     }
 
-    response = requests.get(url, headers=headers, timeout=30)
+    response = SESSION.get(url, headers=headers, timeout=30)
 
     if response.status_code == 200:
         # エンコーディング検出
@@ -102,36 +131,62 @@ def fetch_thread_html(url: str) -> str:
     raise Exception(f"スレッドの取得に失敗しました (HTTP {response.status_code})")
 
 
-def parse_dat_content(dat_content: str) -> list:
+def parse_dat_content(dat_content: Union[bytes, bytearray], start: int = 1,
+                      end: Optional[int] = None) -> Tuple[List[str], int]:
     """
-    dat形式のコンテンツを解析してレス本文のリストを返す
+    dat形式のコンテンツ（Shift-JISのバイト列）を解析してレス本文のリストを返す
 
     dat形式: 名前<>メール<>日付ID<>本文<>スレタイ（1レス目のみ）
+
+    Args:
+        dat_content: datのバイト列
+        start: 取得する最初のレス番号（1-indexed）
+        end: 取得する最後のレス番号（Noneなら最後まで）
+
+    Returns:
+        (範囲内のレス本文のリスト, 全レス数)
     """
-    posts = []
-    lines = dat_content.strip().split('\n')
+    # 範囲外のレスは行の分割と件数カウントだけ行い、本文のデコード・タグ除去はしない
+    raw_bodies, total_posts = _select_post_range(
+        _iter_dat_bodies(dat_content), start, end
+    )
+    return [_clean_dat_body(raw_body) for raw_body in raw_bodies], total_posts
 
-    for line in lines:
-        parts = line.split('<>')
+
+def _iter_dat_bodies(dat_content: Union[bytes, bytearray]) -> Iterator[bytes]:
+    """
+    datの各行から本文（4番目の要素、インデックス3）をバイト列のまま1件ずつ返す
+
+    Shift-JISの2バイト目に '<' や改行は現れないため、デコード前に分割できる。
+    名前・日付などはデコードしない
+    """
+    for line in dat_content.split(b'\n'):
+        parts = line.split(b'<>', 4)
         if len(parts) >= 4:
-            # 本文は4番目の要素（インデックス3）
-            body = parts[3]
-            # HTMLタグを除去
-            body = re.sub(r'<br>', '\n', body)
-            body = re.sub(r'<[^>]+>', '', body)
-            # HTMLエンティティをデコード
-            body = body.replace('&gt;', '>').replace('&lt;', '<')
-            body = body.replace('&amp;', '&').replace('&quot;', '"')
-            posts.append(body.strip())
+            yield parts[3]
 
-    return posts
+
+def _clean_dat_body(raw_body: bytes) -> str:
+    """
+    dat本文1件をデコードしてHTMLタグ・エンティティを除去
+    """
+    # Shift-JISでデコード
+    body = raw_body.decode('cp932', errors='replace')
+    # HTMLタグを除去（タグを含まない本文は正規表現を通さない）
+    if '<' in body:
+        body = _TAG_RE.sub('', _BR_RE.sub('\n', body))
+    # HTMLエンティティをデコード
+    # 数値参照（&#12354; など）も正しく扱うため html.unescape を使う。
+    # エンティティごとにPythonの置換関数が呼ばれるので replace の連鎖よりは遅い
+    body = html.unescape(body)
+    return body.strip()
 
 
 def parse_html_content(html_content: str) -> list:
     """
     HTML形式のコンテンツを解析してレス本文のリストを返す
     """
-    soup = BeautifulSoup(html_content, 'lxml')
+    tree = LexborHTMLParser(html_content)
     posts = []
 
     # 5ch の投稿本文を取得（複数のセレクタを試行）
@@ -144,38 +199,80 @@ def parse_html_content(html_content: str) -> list:
     ]
 
     for selector in selectors:
-        messages = soup.select(selector)
+        messages = tree.css(selector)
         if messages:
             for msg in messages:
-                text = msg.get_text(separator='\n', strip=True)
+                text = _node_text(msg)
                 if text:
                     posts.append(text)
             break
 
     # フォールバック: postクラスを持つ要素を探す
     if not posts:
-        for post in soup.find_all(class_=re.compile(r'post|res|comment')):
-            # 本文部分を探す
-            body = post.find(class_=re.compile(r'message|body|content'))
+        for post in tree.css('[class]'):
+            if not _POST_CLASS_RE.search(post.attributes.get('class') or ''):
+                continue
+            # 本文部分を探す（css() は自身も含むので子孫のみ対象）
+            body = next(
+                (
+                    node for node in post.css('[class]')
+                    if node != post
+                    and _BODY_CLASS_RE.search(node.attributes.get('class') or '')
+                ),
+                None
+            )
             if body:
-                text = body.get_text(separator='\n', strip=True)
+                text = _node_text(body)
                 if text:
                     posts.append(text)
 
     return posts
 
 
-def scrape_thread(url: str) -> dict:
+def _node_text(node) -> str:
+    """
+    要素のテキストを改行区切りで取得（空行は除く）
+    """
+    text = node.text(separator='\n', strip=True)
+    return '\n'.join(line for line in text.split('\n') if line)
+
+
+def _select_post_range(posts: Iterable, start: int = 1,
+                       end: Optional[int] = None) -> Tuple[list, int]:
+    """
+    レス列からレス番号範囲（1-indexed、end含む）の要素だけを取り出す
+
+    範囲外の要素はリストに保持せず数えるだけにする
+
+    Returns:
+        (範囲内の要素のリスト, 全レス数)
+    """
+    posts_iter = iter(posts)
+
+    skipped = sum(1 for _ in islice(posts_iter, start - 1))
+    if end is None:
+        selected = list(posts_iter)
+    else:
+        selected = list(islice(posts_iter, max(end - start + 1, 0)))
+    remaining = sum(1 for _ in posts_iter)
+
+    return selected, skipped + len(selected) + remaining
+
+
+def scrape_thread(url: str, start: int = 1, end: Optional[int] = None) -> dict:
     """
     5chスレッドをスクレイピングしてレス一覧を取得
 
     Args:
         url: 5chスレッドURL
+        start: 取得する最初のレス番号（1-indexed）
+        end: 取得する最後のレス番号（Noneなら最後まで）
 
     Returns:
         dict: {
-            'posts': レス本文のリスト,
-            'post_count': レス数,
+            'posts': 範囲内のレス本文のリスト,
+            'post_count': 範囲内のレス数,
+            'total_posts': スレッドの全レス数,
             'url': 元URL
         }
     """
@@ -185,31 +282,37 @@ def scrape_thread(url: str) -> dict:
     except ValueError as e:
         raise Exception(str(e))
 
-    posts = []
-
     # dat形式で取得を試行
-    dat_content = fetch_thread_dat(
+    status_code, dat_content = fetch_thread_dat(
         thread_info['host'],
         thread_info['board'],
         thread_info['thread_id'],
         thread_info['base_url']
     )
 
-    if dat_content:
-        posts = parse_dat_content(dat_content)
+    posts = []
+    total_posts = 0
 
-    # dat形式が失敗した場合、HTML形式でフォールバック
-    if not posts:
-        time.sleep(REQUEST_INTERVAL)  # レート制限対策
+    if status_code == 200:
+        posts, total_posts = parse_dat_content(dat_content, start, end)
+
+    # dat形式が失敗した場合（200でもdat以外の内容で0件の場合を含む）、HTML形式でフォールバック
+    if not total_posts:
+        if status_code != 200:
+            # datが200以外の場合のみ待機（200で0件なら待機は不要）
+            time.sleep(REQUEST_INTERVAL)  # レート制限対策
         html_content = fetch_thread_html(url)
-        posts = parse_html_content(html_content)
+        posts, total_posts = _select_post_range(
+            parse_html_content(html_content), start, end
+        )
 
-    if not posts:
+    if not total_posts:
         raise Exception("レスの取得に失敗しました。URLを確認してください。")
 
     return {
         'posts': posts,
         'post_count': len(posts),
+        'total_posts': total_posts,
         'url': url
     }
 
@@ -223,3 +326,19 @@ if __name__ == "__main__":
         for i, post in enumerate(result['posts'][:5], 1):
             print(f"\n--- レス {i} ---")
             print(post[:200] + "..." if len(post) > 200 else post)
+    else:
+        # テスト: datのURLが200でHTMLを返した場合もHTML形式でフォールバックする
+        print("=== テスト: dat が200でHTMLを返す場合 ===")
+
+        def fake_get(url, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response.encoding = 'utf-8'
+            response._content = "<div class='message'>hi</div>".encode('utf-8')
+            response._content_consumed = True
+            return response
+
+        SESSION.get = fake_get
+        result = scrape_thread('https://example.5ch.net/test/read.cgi/board/1234567890/')
+        print(f"取得レス: {result['posts']}")
+        print("期待: ['hi']")